@@ -78,7 +78,7 @@ def check_flagged_words(comment):
 
 def process_comment_file(corpus_folder, file):
     # Read file
-    with open(os.path.join(corpus_folder, file), 'r') as f:
+    with open(os.path.join(corpus_folder, file), 'r', encoding='utf-8') as f:
         data = json.load(f)
     # Process comments
     comments_list = []
@@ -167,13 +167,11 @@ def main():
                 dialogues_to_json = {i:d for i,d in enumerate(dialogues)}
                 dialogues_compact_to_json = {'comments': unique_comments_list, 'dialogues': dialogues_to_json}
                 if args.output_folder_verbose:
+                    # Reuse the cleaned text of each comment instead of cleaning it again for every dialogue
+                    cleaned = {comment['id']: comment['text'] for comment in unique_comments_list}
                     dialogues_verbose_to_json = {}
                     for i in dialogues_to_json:
-                        dialogue_verbose = []
-                        for order in dialogues_to_json[i]:
-                            comment = [c for c in comments_list if c['comment_id'] == order][0]
-                            dialogue_verbose.append(clean_text(comment['comment_text']))
-                        dialogues_verbose_to_json[i] = dialogue_verbose
+                        dialogues_verbose_to_json[i] = [cleaned[order] for order in dialogues_to_json[i]]
 
                 with open(os.path.join(output_folder, file), 'w') as f:
                     json.dump(dialogues_compact_to_json, f)
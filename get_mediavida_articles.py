@@ -4,29 +4,60 @@ from bs4 import BeautifulSoup
 import pandas as pd
 import argparse
 import os
+import functools
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from util import create_ifnotexists_directory
 
+MAX_WORKERS = 8
+
+def get_page_articles(session, url):
+    try:
+        r = session.get(url)
+    except requests.exceptions.RequestException as e:
+        # A failed page must not discard the pages already scraped, it is reported at the end
+        print(f'Request failed with error: {e}')
+        time.sleep(1)
+        return None
+    soup = BeautifulSoup(r.content, 'lxml')
+    articles = soup.find_all("div", {"class": "thread"})
+    articles_dict = []
+    for article in articles:
+        article_dict = {}
+        article_id = article.find('a')['id']
+        print(article_id)
+        article_link = 'https://www.mediavida.com' + article.find('a')['href']
+        article_dict['article_id'] = article_id
+        article_dict['article_link'] = article_link
+        articles_dict.append(article_dict)
+    time.sleep(1)
+    return articles_dict
+
 def get_articles(base_url, num_pages=1500, output_folder='output'):
     # Create an HTMLSession object
     session = HTMLSession()
+    retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS, max_retries=retries))
 
     num_pages = num_pages  # Replace with the number of pages you want to scrape
+    urls = [base_url + '/p' + str(page_num) for page_num in range(1, num_pages + 1)]
     articles_dict = []
-    for page_num in range(1, num_pages + 1):
-        url = base_url + '/p' + str(page_num)
-        r = session.get(url)
-        soup = BeautifulSoup(r.text, 'html.parser')
-        articles = soup.find_all("div", {"class": "thread"})
-        for article in articles:
-            article_dict = {}
-            article_id = article.find('a')['id']
-            print(article_id)
-            article_link = 'https://www.mediavida.com' + article.find('a')['href']
-            article_dict['article_id'] = article_id
-            article_dict['article_link'] = article_link
-            articles_dict.append(article_dict)
-        time.sleep(1)
+    failed_urls = []
+    # Fetch listing pages concurrently, keeping page order in the output
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for url, page_articles in zip(urls, executor.map(functools.partial(get_page_articles, session), urls)):
+            if page_articles is None:
+                failed_urls.append(url)
+                continue
+            articles_dict.extend(page_articles)
+
+    if failed_urls:
+        print(f'{len(failed_urls)} listing pages failed and are missing from articles.csv:')
+        for url in failed_urls:
+            print(url)
 
     df = pd.DataFrame(articles_dict)
     df.to_csv(os.path.join(output_folder, 'articles.csv'), index=False, sep=',')
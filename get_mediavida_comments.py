@@ -1,27 +1,68 @@
 import re
+import csv
+import sqlite3
 import requests
+import requests_cache
 import os
-import pandas as pd
-import json
+import orjson
 from bs4 import BeautifulSoup
 import argparse
+import pathlib
+from multiprocessing import Pool
+from requests.adapters import HTTPAdapter
 
 from util import create_ifnotexists_directory
 
-def get_comments(link):
-    page = requests.get(link)
-    soup = BeautifulSoup(page.content, 'html.parser')
-    comments = soup.find_all('div', {'id': re.compile('^post-\d+')})
-    next_link = soup.find('a', {'class': 'btn btn-primary'})
-    if next_link:
-        next_link = 'https://www.mediavida.com' + next_link['href']
-        comments += get_comments(next_link)
+# General threads that are not worth scraping
+SKIP_RE = re.compile(r'hilo|referendum|manana|coronachat|tinder|sorteamos')
+POST_ID_RE = re.compile(r'^post-\d+')
+AUTHOR_CLS_RE = re.compile(r'^autor user-card')
+MAX_PAGES = 5000
+
+def new_session():
+    # Pages are cached on disk so reruns after failures do not hit the network again
+    # WAL and a busy timeout let the worker processes share the cache file without lock errors
+    sess = requests_cache.CachedSession('mv_cache', backend='sqlite', expire_after=86400,
+                                        cache_control=True, stale_if_error=True,
+                                        wal=True, busy_timeout=30000)
+    sess.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=20))
+    sess.headers.update({'User-Agent': 'Mozilla/5.0'})
+    return sess
+
+# Created lazily by get_session, so importing the module opens no cache connection
+SESSION = None
+
+def get_session():
+    global SESSION
+    if SESSION is None:
+        SESSION = new_session()
+    return SESSION
+
+def init_worker():
+    # Each worker process keeps its own connection pool and cache connection
+    global SESSION
+    SESSION = new_session()
+
+def get_comments(link, sess=None, max_pages=MAX_PAGES):
+    if sess is None:
+        sess = get_session()
+    comments = []
+    seen = set()
+    url = link
+    # Stop on pagination loops as well as on the last page
+    while url and url not in seen and len(seen) < max_pages:
+        seen.add(url)
+        page = sess.get(url)
+        soup = BeautifulSoup(page.content, 'lxml')
+        comments.extend(soup.find_all('div', {'id': POST_ID_RE}))
+        next_link = soup.find('a', {'class': 'btn btn-primary'})
+        url = 'https://www.mediavida.com' + next_link['href'] if next_link else None
     return comments
 
 def process_comment(comment):
     text = comment.find('div', {'class': 'post-contents'}).text.strip()
     comment_id = comment['id'].split('-')[1]
-    user = comment.find('a', {'class': re.compile('^autor user-card')})
+    user = comment.find('a', {'class': AUTHOR_CLS_RE})
     if user is None:
         user = '[deleted]'
     else:
@@ -32,44 +73,52 @@ def process_comment(comment):
         'content': text
     }
 
+def process_article(row):
+    print('Getting comments for article ' + row['article_id'] + '...')
+    print('Link: ' + row['article_link'])
+
+    article_dict = {}
+    try:
+        article_dict['url'] = row['article_link']
+        comments = get_comments(row['article_link'], get_session())
+        comment_dicts = []
+        for comment in comments:
+            comment_dicts.append(process_comment(comment))
+        article_dict['objects'] = comment_dicts
+    except (requests.exceptions.RequestException, sqlite3.OperationalError) as e:
+        print(f'Request failed with error: {e}')
+        return row['article_id'], None
+    return row['article_id'], article_dict
+
+def keep_article(row, existing_ids):
+    if row['article_id'] in existing_ids:
+        print('Article ' + row['article_id'] + ' already exists. Skipping...')
+        return False
+
+    if SKIP_RE.search(row['article_link']):
+        print('Article ' + row['article_id'] + ' is a general thread. Skipping...')
+        return False
+
+    return True
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--articles_metadata_folder', type=str, required=True)
     parser.add_argument('--output_folder', type=str, required=True)
+    parser.add_argument('--num_processes', type=int, default=4)
     args = parser.parse_args()
 
     output_folder = args.output_folder
     create_ifnotexists_directory(output_folder)
 
-    metadata = pd.read_csv(os.path.join(args.articles_metadata_folder, 'articles.csv'))
-    existing_ids = [file.split('.')[0] for file in os.listdir(output_folder)]
-    for index, row in metadata.iterrows():
-        if row['article_id'] in existing_ids:
-            print('Article ' + row['article_id'] + ' already exists. Skipping...')
-            continue
-
-        if "hilo" in row['article_link'] or "referendum" in row['article_link'] or 'manana' in row['article_link']  \
-                or 'coronachat' in row['article_link'] or 'tinder' in row['article_link'] or 'sorteamos' in row['article_link']:
-            print('Article ' + row['article_id'] + ' is a general thread. Skipping...')
-            continue
-
-        print('Getting comments for article ' + row['article_id'] + '...')
-        print('Link: ' + row['article_link'])
-
-        article_dict = {}
-        try:
-            article_dict['url'] = row['article_link']
-            comments = get_comments(row['article_link'])
-            comment_dicts = []
-            for comment in comments:
-                comment_dicts.append(process_comment(comment))
-            article_dict['objects'] = comment_dicts
-        except requests.exceptions.RequestException as e:
-            print(f'Request failed with error: {e}')
-            continue
-        except RecursionError:
-            print('Recursion error. Skipping...')
-            continue
-
-        with open(os.path.join(output_folder, row['article_id'] + '.json'), 'w') as f:
-            json.dump(article_dict, f)
\ No newline at end of file
+    existing_ids = {file.split('.')[0] for file in os.listdir(output_folder)}
+    with open(os.path.join(args.articles_metadata_folder, 'articles.csv'), newline='', encoding='utf-8') as f:
+        # Rows are filtered lazily and dispatched to the workers while the file is read
+        rows = (row for row in csv.DictReader(f) if keep_article(row, existing_ids))
+
+        # Workers scrape articles, the main process is the only one writing files
+        with Pool(processes=args.num_processes, initializer=init_worker) as pool:
+            for article_id, article_dict in pool.imap_unordered(process_article, rows):
+                if article_dict is None:
+                    continue
+                pathlib.Path(output_folder, article_id + '.json').write_bytes(orjson.dumps(article_dict))